@@ -1,14 +1,21 @@
 import os
 import json
+import asyncio
+import tempfile
 from datetime import datetime
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
 from dotenv import load_dotenv
 from database import Database
 from security import SecurityManager
+from state_store import StateStore
+import subscribers_io
 
 load_dotenv()
 
+# Telegram Bot API не позволяет боту скачивать файлы больше 20 МБ
+MAX_DOWNLOAD_SIZE = 20 * 1024 * 1024
+
 class AdminBot:
     def __init__(self):
         self.token = os.getenv('ADMIN_BOT_TOKEN')
@@ -20,7 +27,8 @@ class AdminBot:
         
         self.db = Database()
         self.load_events()
-        self.pending_data = {}  # Для хранения данных в процессе добавления события
+        # Состояния мастеров (добавление события, рассылка, импорт) с TTL и сохранением в SQLite
+        self.pending_data = StateStore(db_path=self.db.db_path)
     
     def load_events(self):
         """Загружает события из JSON файла"""
@@ -44,6 +52,8 @@ class AdminBot:
         
         keyboard = [
             [InlineKeyboardButton("👥 Подписчики", callback_data='subscribers')],
+            [InlineKeyboardButton("📦 Экспорт подписчиков", callback_data='export_subscribers'),
+             InlineKeyboardButton("📥 Импорт подписчиков", callback_data='import_subscribers')],
             [InlineKeyboardButton("📅 Все события", callback_data='events_list')],
             [InlineKeyboardButton("➕ Добавить событие", callback_data='add_event')],
             [InlineKeyboardButton("🗑️ Удалить событие", callback_data='delete_event')],
@@ -74,6 +84,10 @@ class AdminBot:
         
         if query.data == 'subscribers':
             await self.show_subscribers(query)
+        elif query.data == 'export_subscribers':
+            await self.export_subscribers(query)
+        elif query.data == 'import_subscribers':
+            await self.start_import_subscribers(query)
         elif query.data == 'events_list':
             await self.show_events_list(query)
         elif query.data == 'add_event':
@@ -91,6 +105,8 @@ class AdminBot:
         elif query.data == 'back':
             keyboard = [
                 [InlineKeyboardButton("👥 Подписчики", callback_data='subscribers')],
+                [InlineKeyboardButton("📦 Экспорт подписчиков", callback_data='export_subscribers'),
+                 InlineKeyboardButton("📥 Импорт подписчиков", callback_data='import_subscribers')],
                 [InlineKeyboardButton("📅 Все события", callback_data='events_list')],
                 [InlineKeyboardButton("➕ Добавить событие", callback_data='add_event')],
                 [InlineKeyboardButton("🗑️ Удалить событие", callback_data='delete_event')],
@@ -122,6 +138,28 @@ class AdminBot:
         
         await query.message.reply_text(text)
     
+    async def export_subscribers(self, query):
+        """Выгружает подписчиков файлом subscribers.jsonl.gz"""
+        await query.message.reply_text("📦 Готовлю выгрузку подписчиков...")
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'subscribers.jsonl.gz')
+            count, elapsed = await asyncio.to_thread(subscribers_io.export_subscribers, self.db, path)
+            with open(path, 'rb') as f:
+                await query.message.reply_document(
+                    document=f,
+                    filename='subscribers.jsonl.gz',
+                    caption=f"✅ Экспорт: {subscribers_io.format_rate(count, elapsed)}"
+                )
+    
+    async def start_import_subscribers(self, query):
+        """Начинает процесс импорта подписчиков"""
+        await query.message.reply_text(
+            "📥 Импорт подписчиков\n\n"
+            "Отправьте файл .jsonl или .csv (можно сжатый .gz).\n"
+            "Повторяющиеся user_id не создают дублей."
+        )
+        self.pending_data.set(query.from_user.id, {'step': 'import_file'})
+    
     async def show_events_list(self, query):
         """Показывает список всех событий"""
         if not self.events:
@@ -147,7 +185,7 @@ class AdminBot:
             "Отправьте дату в формате: YYYY-MM-DD\n"
             "Например: 2024-12-19"
         )
-        self.pending_data[query.from_user.id] = {'step': 'date'}
+        self.pending_data.set(query.from_user.id, {'step': 'date'})
     
     async def start_delete_event(self, query):
         """Начинает процесс удаления события"""
@@ -207,7 +245,8 @@ class AdminBot:
             "Эта функция отправит сообщение всем подписчикам.\n"
             "Введите текст сообщения:"
         )
-        self.pending_data[query.from_user.id] = {'step': 'test_message'}
+        # Шаг рассылки не сохраняем: после падения бот не должен разослать случайное сообщение
+        self.pending_data.set(query.from_user.id, {'step': 'test_message'}, persist=False)
     
     async def handle_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик текстовых сообщений"""
@@ -217,10 +256,11 @@ class AdminBot:
         
         user_id = update.effective_user.id
         
-        if user_id not in self.pending_data:
+        data = self.pending_data.get(user_id)
+        if data is None:
             return
         
-        step = self.pending_data[user_id]['step']
+        step = data['step']
         text = update.message.text
         
         if step == 'date':
@@ -233,8 +273,9 @@ class AdminBot:
                 )
                 return
             
-            self.pending_data[user_id]['date'] = text
-            self.pending_data[user_id]['step'] = 'title'
+            data['date'] = text
+            data['step'] = 'title'
+            self.pending_data.set(user_id, data)
             await update.message.reply_text(
                 f"✅ Дата: {text}\n\n"
                 "Отправьте заголовок события:"
@@ -247,8 +288,9 @@ class AdminBot:
                 await update.message.reply_text("❌ Заголовок не может быть пустым!")
                 return
             
-            self.pending_data[user_id]['title'] = title
-            self.pending_data[user_id]['step'] = 'description'
+            data['title'] = title
+            data['step'] = 'description'
+            self.pending_data.set(user_id, data)
             await update.message.reply_text(
                 f"✅ Заголовок: {title}\n\n"
                 "Отправьте описание события:"
@@ -261,8 +303,9 @@ class AdminBot:
                 await update.message.reply_text("❌ Описание не может быть пустым!")
                 return
             
-            self.pending_data[user_id]['description'] = description
-            self.pending_data[user_id]['step'] = 'image'
+            data['description'] = description
+            data['step'] = 'image'
+            self.pending_data.set(user_id, data)
             await update.message.reply_text(
                 f"✅ Описание сохранено\n\n"
                 "Отправьте ссылку на картинку (или отправьте /skip чтобы пропустить):"
@@ -270,7 +313,7 @@ class AdminBot:
         
         elif step == 'image':
             if text.lower() == '/skip':
-                self.pending_data[user_id]['image'] = None
+                data['image'] = None
             else:
                 # Валидация URL картинки
                 if not self.security.validate_url(text):
@@ -280,15 +323,16 @@ class AdminBot:
                         "Или отправьте /skip чтобы пропустить"
                     )
                     return
-                self.pending_data[user_id]['image'] = text
-            self.pending_data[user_id]['step'] = 'map'
+                data['image'] = text
+            data['step'] = 'map'
+            self.pending_data.set(user_id, data)
             await update.message.reply_text(
                 "Отправьте ссылку на карту (или отправьте /skip чтобы пропустить):"
             )
         
         elif step == 'map':
             if text.lower() == '/skip':
-                self.pending_data[user_id]['map_url'] = None
+                data['map_url'] = None
             else:
                 # Валидация URL карты
                 if not self.security.validate_url(text):
@@ -298,10 +342,9 @@ class AdminBot:
                         "Или отправьте /skip чтобы пропустить"
                     )
                     return
-                self.pending_data[user_id]['map_url'] = text
+                data['map_url'] = text
             
             # Сохраняем событие
-            data = self.pending_data[user_id]
             date = data['date']
             
             self.events[date] = {
@@ -313,7 +356,7 @@ class AdminBot:
             self.save_events()
             self.load_events()
             
-            del self.pending_data[user_id]
+            self.pending_data.delete(user_id)
             
             await update.message.reply_text(
                 f"✅ Событие добавлено!\n\n"
@@ -325,6 +368,9 @@ class AdminBot:
             )
         
         elif step == 'test_message':
+            # Сбрасываем шаг до рассылки, чтобы следующее сообщение не ушло подписчикам повторно
+            self.pending_data.delete(user_id)
+            
             # Отправляем тестовое сообщение всем подписчикам
             subscribers = self.db.get_all_subscribers()
             sent = 0
@@ -334,7 +380,6 @@ class AdminBot:
             main_bot_token = os.getenv('TELEGRAM_BOT_TOKEN')
             if not main_bot_token:
                 await update.message.reply_text("❌ TELEGRAM_BOT_TOKEN не найден в .env")
-                del self.pending_data[user_id]
                 return
             
             bot = Bot(token=main_bot_token)
@@ -349,7 +394,6 @@ class AdminBot:
                     failed += 1
                     print(f"Ошибка отправки {sub_id}: {e}")
             
-            del self.pending_data[user_id]
             await update.message.reply_text(
                 f"✅ Рассылка завершена!\n\n"
                 f"📤 Отправлено: {sent}\n"
@@ -364,7 +408,9 @@ class AdminBot:
         
         user_id = update.effective_user.id
         
-        if user_id in self.pending_data and self.pending_data[user_id]['step'] == 'image':
+        data = self.pending_data.get(user_id)
+        
+        if data and data['step'] == 'image':
             # Получаем file_id фотографии
             photo = update.message.photo[-1]  # Берем фото наибольшего размера
             file_id = photo.file_id
@@ -374,23 +420,80 @@ class AdminBot:
             file = await bot.get_file(file_id)
             file_url = file.file_path
             
-            self.pending_data[user_id]['image'] = f"https://api.telegram.org/file/bot{self.token}/{file_url}"
-            self.pending_data[user_id]['step'] = 'map'
+            data['image'] = f"https://api.telegram.org/file/bot{self.token}/{file_url}"
+            data['step'] = 'map'
+            self.pending_data.set(user_id, data)
             
             await update.message.reply_text(
                 "✅ Картинка сохранена!\n\n"
                 "Отправьте ссылку на карту (или отправьте /skip чтобы пропустить):"
             )
     
+    async def handle_document(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик файлов (импорт подписчиков)"""
+        has_access, error_msg = self.security.check_admin_access(update)
+        if not has_access:
+            return
+        
+        user_id = update.effective_user.id
+        
+        data = self.pending_data.get(user_id)
+        if data is None or data['step'] != 'import_file':
+            return
+        
+        document = update.message.document
+        filename = os.path.basename(document.file_name or '')
+        try:
+            fmt = subscribers_io.detect_format(filename)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+        
+        if document.file_size and document.file_size > MAX_DOWNLOAD_SIZE:
+            await update.message.reply_text(
+                "❌ Файл больше 20 МБ — Telegram не дает боту его скачать.\n"
+                "Сожмите файл в .gz или используйте: python3 subscribers_io.py import <файл>"
+            )
+            return
+        
+        self.pending_data.delete(user_id)
+        await update.message.reply_text("📥 Загружаю подписчиков...")
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, filename)
+            try:
+                file = await context.bot.get_file(document.file_id)
+                await file.download_to_drive(path)
+                count, skipped, elapsed = await asyncio.to_thread(
+                    subscribers_io.import_subscribers, self.db, path, fmt
+                )
+            except Exception as e:
+                print(f"Ошибка импорта подписчиков: {e}")
+                await update.message.reply_text(f"❌ Ошибка импорта: {e}")
+                return
+        
+        await update.message.reply_text(
+            f"✅ Импорт завершен!\n\n"
+            f"📥 {subscribers_io.format_rate(count, elapsed)}\n"
+            f"⚠️ Пропущено некорректных строк: {skipped}"
+        )
+    
     def run(self):
         """Запускает админ-бота"""
-        application = Application.builder().token(self.token).build()
+        application = (
+            Application.builder()
+            .token(self.token)
+            .post_init(self.pending_data.start)
+            .post_shutdown(self.pending_data.stop)
+            .build()
+        )
         
         # Регистрируем обработчики
         application.add_handler(CommandHandler("start", self.start))
         application.add_handler(CallbackQueryHandler(self.button_handler))
         application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_message))
         application.add_handler(MessageHandler(filters.PHOTO, self.handle_photo))
+        application.add_handler(MessageHandler(filters.Document.ALL, self.handle_document))
         
         print("Админ-бот запущен!")
         application.run_polling()
@@ -47,4 +47,63 @@ class Database:
         subscribers = cursor.fetchall()
         conn.close()
         return subscribers
-
+    
+    def iter_subscribers_info(self, chunk_size: int = 10000):
+        """Построчно отдает подписчиков, читая таблицу порциями по chunk_size"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT user_id, username, subscribed_at FROM subscribers ORDER BY user_id')
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            conn.close()
+    
+    def import_subscribers(self, rows, chunk_size: int = 5000, commit_every: int = 100000) -> int:
+        """Массово добавляет подписчиков из итератора (user_id, username, subscribed_at).
+        
+        Вставка идет пачками через executemany, коммит — раз в commit_every строк.
+        Повторы по user_id не создают дублей: обновляется username (пустой
+        не затирает сохраненный), а дата подписки сохраняется самая ранняя.
+        """
+        conn = sqlite3.connect(self.db_path)
+        total = 0
+        try:
+            cursor = conn.cursor()
+            cursor.execute('PRAGMA synchronous = NORMAL')
+            batch = []
+            since_commit = 0
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= chunk_size:
+                    self._insert_batch(cursor, batch)
+                    total += len(batch)
+                    since_commit += len(batch)
+                    batch = []
+                    if since_commit >= commit_every:
+                        conn.commit()
+                        since_commit = 0
+            if batch:
+                self._insert_batch(cursor, batch)
+                total += len(batch)
+            conn.commit()
+        finally:
+            conn.close()
+        return total
+    
+    def _insert_batch(self, cursor, batch):
+        """Вставляет пачку подписчиков с дедупликацией по user_id"""
+        cursor.executemany('''
+            INSERT INTO subscribers (user_id, username, subscribed_at)
+            VALUES (?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ON CONFLICT(user_id) DO UPDATE SET
+                username = COALESCE(excluded.username, subscribers.username),
+                subscribed_at = COALESCE(
+                    MIN(subscribers.subscribed_at, excluded.subscribed_at),
+                    subscribers.subscribed_at,
+                    excluded.subscribed_at
+                )
+        ''', batch)
@@ -0,0 +1,174 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+class StateStore:
+    """Хранилище состояний диалогов (мастеров) админ-бота.
+
+    Состояния держатся в памяти как LRU с ограничением по размеру и TTL.
+    Если указан db_path, изменения пачкой сбрасываются в SQLite фоновой
+    задачей раз в flush_interval секунд, поэтому обработчики сообщений
+    не ждут записи на диск, а незаконченные мастера переживают перезапуск.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, ttl: float = 3600,
+                 max_size: int = 1000, flush_interval: float = 5):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_size = max_size
+        self.flush_interval = flush_interval
+        self._data = OrderedDict()  # user_id -> (state, updated_at)
+        self._dirty = set()
+        self._volatile = set()  # user_id, чьи состояния не сохраняются в базу
+        self._lock = threading.Lock()
+        self._flush_task = None
+        if self.db_path:
+            self.init_db()
+            self.load()
+
+    def init_db(self):
+        """Создает таблицу состояний"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS admin_states (
+                user_id INTEGER PRIMARY KEY,
+                state TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def load(self):
+        """Загружает неистекшие состояния из базы"""
+        conn = sqlite3.connect(self.db_path)
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM admin_states WHERE updated_at < ?', (time.time() - self.ttl,))
+        cursor.execute('SELECT user_id, state, updated_at FROM admin_states ORDER BY updated_at')
+        rows = cursor.fetchall()
+        conn.commit()
+        conn.close()
+        with self._lock:
+            for user_id, state, updated_at in rows[-self.max_size:]:
+                self._data[user_id] = (json.loads(state), updated_at)
+
+    def _is_expired(self, updated_at: float, now: float) -> bool:
+        return now - updated_at > self.ttl
+
+    def get(self, user_id: int) -> Optional[dict]:
+        """Возвращает копию состояния пользователя или None"""
+        with self._lock:
+            item = self._data.get(user_id)
+            if item is None:
+                return None
+            state, updated_at = item
+            if self._is_expired(updated_at, time.time()):
+                del self._data[user_id]
+                self._volatile.discard(user_id)
+                self._dirty.add(user_id)
+                return None
+            self._data.move_to_end(user_id)
+            return dict(state)
+
+    def set(self, user_id: int, state: dict, persist: bool = True):
+        """Сохраняет состояние пользователя целиком.
+
+        С persist=False состояние живет только в памяти и не восстанавливается
+        после перезапуска (а ранее сохраненная запись удаляется из базы).
+        """
+        with self._lock:
+            self._data[user_id] = (dict(state), time.time())
+            self._data.move_to_end(user_id)
+            self._dirty.add(user_id)
+            if persist:
+                self._volatile.discard(user_id)
+            else:
+                self._volatile.add(user_id)
+            while len(self._data) > self.max_size:
+                evicted, _ = self._data.popitem(last=False)
+                self._volatile.discard(evicted)
+                self._dirty.add(evicted)
+
+    def delete(self, user_id: int):
+        """Удаляет состояние пользователя"""
+        with self._lock:
+            self._data.pop(user_id, None)
+            self._volatile.discard(user_id)
+            self._dirty.add(user_id)
+
+    def purge_expired(self):
+        """Удаляет истекшие состояния из памяти"""
+        now = time.time()
+        with self._lock:
+            expired = [user_id for user_id, (_, updated_at) in self._data.items()
+                       if self._is_expired(updated_at, now)]
+            for user_id in expired:
+                del self._data[user_id]
+                self._volatile.discard(user_id)
+                self._dirty.add(user_id)
+
+    def flush(self):
+        """Записывает накопленные изменения в базу одной транзакцией"""
+        self.purge_expired()
+        if not self.db_path:
+            with self._lock:
+                self._dirty.clear()
+            return
+        with self._lock:
+            if not self._dirty:
+                return
+            dirty, self._dirty = self._dirty, set()
+            upserts = []
+            deletes = []
+            for user_id in dirty:
+                item = self._data.get(user_id)
+                if item is None or user_id in self._volatile:
+                    deletes.append((user_id,))
+                else:
+                    upserts.append((user_id, json.dumps(item[0], ensure_ascii=False), item[1]))
+        try:
+            conn = sqlite3.connect(self.db_path)
+            try:
+                cursor = conn.cursor()
+                cursor.executemany('DELETE FROM admin_states WHERE user_id = ?', deletes)
+                cursor.executemany('''
+                    INSERT OR REPLACE INTO admin_states (user_id, state, updated_at)
+                    VALUES (?, ?, ?)
+                ''', upserts)
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error:
+            with self._lock:
+                self._dirty |= dirty
+            raise
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                print(f"Ошибка сохранения состояний админ-бота: {e}")
+
+    async def start(self, application=None):
+        """Запускает фоновый сброс изменений (подходит как post_init)"""
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self, application=None):
+        """Останавливает фоновый сброс и сохраняет остаток (подходит как post_shutdown)"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await asyncio.to_thread(self.flush)
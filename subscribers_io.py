@@ -0,0 +1,142 @@
+import argparse
+import csv
+import gzip
+import json
+import time
+from typing import Iterator, Optional, Tuple
+from database import Database
+
+FORMATS = ('jsonl', 'csv')
+CSV_FIELDS = ['user_id', 'username', 'subscribed_at']
+# INTEGER в SQLite — знаковое 64-битное число
+SQLITE_INT_MIN = -2 ** 63
+SQLITE_INT_MAX = 2 ** 63 - 1
+
+
+def detect_format(path: str) -> str:
+    """Определяет формат файла по расширению (.jsonl/.csv, можно с .gz)"""
+    name = path.lower()
+    if name.endswith('.gz'):
+        name = name[:-3]
+    for fmt in FORMATS:
+        if name.endswith('.' + fmt):
+            return fmt
+    if name.endswith('.json'):
+        return 'jsonl'
+    raise ValueError(f"Не удалось определить формат файла {path}: ожидается .jsonl или .csv (можно .gz)")
+
+
+def open_text(path: str, mode: str):
+    """Открывает файл в текстовом режиме, прозрачно распаковывая/сжимая .gz"""
+    if path.lower().endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def _parse_row(user_id, username, subscribed_at) -> Optional[Tuple[int, Optional[str], Optional[str]]]:
+    """Приводит строку файла к кортежу для вставки, None — если строка некорректна"""
+    if isinstance(user_id, bool) or not isinstance(user_id, (int, str)):
+        return None
+    try:
+        user_id = int(user_id)
+    except ValueError:
+        return None
+    if not SQLITE_INT_MIN <= user_id <= SQLITE_INT_MAX:
+        return None
+    if not isinstance(username, (str, type(None))) or not isinstance(subscribed_at, (str, type(None))):
+        return None
+    return user_id, (username or None), (subscribed_at or None)
+
+
+def _read_jsonl(f, stats: dict) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            stats['skipped'] += 1
+            continue
+        if not isinstance(item, dict):
+            stats['skipped'] += 1
+            continue
+        row = _parse_row(item.get('user_id'), item.get('username'), item.get('subscribed_at'))
+        if row is None:
+            stats['skipped'] += 1
+            continue
+        yield row
+
+
+def _read_csv(f, stats: dict) -> Iterator[Tuple[int, Optional[str], Optional[str]]]:
+    for item in csv.DictReader(f):
+        row = _parse_row(item.get('user_id'), item.get('username'), item.get('subscribed_at'))
+        if row is None:
+            stats['skipped'] += 1
+            continue
+        yield row
+
+
+def export_subscribers(db: Database, path: str, fmt: Optional[str] = None) -> Tuple[int, float]:
+    """Потоково выгружает подписчиков в файл. Возвращает (строк, секунд)"""
+    fmt = fmt or detect_format(path)
+    started = time.monotonic()
+    count = 0
+    with open_text(path, 'w') as f:
+        if fmt == 'csv':
+            writer = csv.writer(f)
+            writer.writerow(CSV_FIELDS)
+            for row in db.iter_subscribers_info():
+                writer.writerow(row)
+                count += 1
+        else:
+            for user_id, username, subscribed_at in db.iter_subscribers_info():
+                f.write(json.dumps(
+                    {'user_id': user_id, 'username': username, 'subscribed_at': subscribed_at},
+                    ensure_ascii=False
+                ))
+                f.write('\n')
+                count += 1
+    return count, time.monotonic() - started
+
+
+def import_subscribers(db: Database, path: str, fmt: Optional[str] = None) -> Tuple[int, int, float]:
+    """Потоково загружает подписчиков из файла.
+
+    Возвращает (загружено строк, пропущено некорректных, секунд).
+    """
+    fmt = fmt or detect_format(path)
+    started = time.monotonic()
+    stats = {'skipped': 0}
+    with open_text(path, 'r') as f:
+        reader = _read_csv(f, stats) if fmt == 'csv' else _read_jsonl(f, stats)
+        count = db.import_subscribers(reader)
+    return count, stats['skipped'], time.monotonic() - started
+
+
+def format_rate(count: int, elapsed: float) -> str:
+    """Форматирует скорость обработки в строках в секунду"""
+    rate = count / elapsed if elapsed > 0 else float(count)
+    return f"{count} строк за {elapsed:.2f} с ({rate:,.0f} строк/с)"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Экспорт и импорт подписчиков (JSONL/CSV, можно .gz)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for command in ('export', 'import'):
+        sub = subparsers.add_parser(command)
+        sub.add_argument('path', help="Путь к файлу, например subscribers.jsonl.gz")
+        sub.add_argument('--format', choices=FORMATS, help="Формат файла (по умолчанию — по расширению)")
+    args = parser.parse_args(argv)
+
+    db = Database()
+    if args.command == 'export':
+        count, elapsed = export_subscribers(db, args.path, args.format)
+        print(f"✅ Экспорт: {format_rate(count, elapsed)} → {args.path}")
+    else:
+        count, skipped, elapsed = import_subscribers(db, args.path, args.format)
+        print(f"✅ Импорт: {format_rate(count, elapsed)}, пропущено: {skipped}")
+
+
+if __name__ == '__main__':
+    main()